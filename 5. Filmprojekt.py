@@ -8,15 +8,20 @@ Features:
 - Search movies by partial name (case-insensitive).
 - View movies sorted by rating or year.
 - Filter movies by rating and year range.
+- Import several movies from OMDb in one go.
 - Exit the application via menu option.
 """
 
-import random
+import hashlib
+import html
+import json
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 import os
 from dotenv import load_dotenv
 import re
-import statistics
+import sys
 import movie_storage_sql as storage
 
 # .env-data load
@@ -26,6 +31,119 @@ API_KEY = os.getenv("API_KEY")
 OMDB_URL = os.getenv("OMDB_URL")
 
 MAX_TITLE_LENGTH = 40
+TABLE_HEADER = f"{'Title':<40} {'Year':<8} {'Rating':<6}"
+TABLE_SEP = "-" * 56
+SEARCH_SEP = "-" * 41
+OMDB_MAX_WORKERS = 8
+_TITLE_RE = re.compile(r"\w", re.UNICODE)  # title needs a letter or digit
+
+# Fingerprint of the movies last written to the website (skip unchanged writes)
+_last_html_sig = None
+
+# HTML snippet for a single movie on the generated website
+MOVIE_ITEM_TEMPLATE = """
+            <li>
+                <div class="movie">
+                    <img class="movie-poster" src="{poster}" alt="Poster of {title}"/>
+                    <div class="movie-title">{title}</div>
+                    <div class="movie-year">{year}</div>
+                </div>
+            </li>
+            """
+
+# Shared HTTP session: keeps OMDb connections alive between requests
+session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=OMDB_MAX_WORKERS, pool_maxsize=OMDB_MAX_WORKERS
+)
+session.mount("http://", _adapter)
+session.mount("https://", _adapter)
+
+
+def lookup_omdb(title):
+    """
+    Look up a title on OMDb, using the local response cache first.
+    Returns (data, error): data is the OMDb JSON (which may itself say
+    "Response": "False"), error is the exception if the request or
+    JSON decoding failed.
+    """
+    data = storage.get_cached_omdb(title)
+    if data is not None:
+        return data, None
+
+    params = {"t": title, "apikey": API_KEY}
+    try:
+        response = session.get(OMDB_URL, params=params, timeout=5)
+        response.raise_for_status()  # Check HTTP error codes
+        data = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        return None, e
+
+    if data.get("Response") != "False":
+        storage.cache_omdb(title, data)
+    return data, None
+
+
+def omdb_error_message(error):
+    """Return a user-facing message for an error from lookup_omdb()."""
+    # Checked first: requests' JSON errors are also RequestExceptions
+    if isinstance(error, ValueError):
+        return "⚠️ Invalid JSON response from OMDb."
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return "⚠️ No internet connection. Please check your network."
+    if isinstance(error, requests.exceptions.Timeout):
+        return "⚠️ The request timed out. Try again later."
+    if isinstance(error, requests.exceptions.HTTPError):
+        return f"⚠️ HTTP error: {error}"
+    return f"⚠️ Error connecting to OMDb API: {error}"
+
+
+def fetch_omdb_movies(titles):
+    """
+    Look up several titles on OMDb in parallel.
+    Returns a dict mapping each title to its (data, error) result
+    from lookup_omdb().
+    """
+    with ThreadPoolExecutor(max_workers=OMDB_MAX_WORKERS) as executor:
+        return dict(zip(titles, executor.map(lookup_omdb, titles)))
+
+
+def parse_omdb_movie(data, title):
+    """
+    Extract title, year, rating and poster URL from an OMDb response.
+    Year falls back to 0 and rating to None if they cannot be parsed.
+    """
+    movie_title = data.get("Title", title)
+
+    # Parse Year safely
+    year_raw = data.get("Year", "")
+    try:
+        movie_year = int(year_raw.split("–")[0])
+    except (ValueError, AttributeError):
+        movie_year = 0
+
+    # Parse IMDb ratings safely
+    try:
+        movie_rating = (
+            float(data.get("imdbRating"))
+            if data.get("imdbRating") not in (None, "N/A") else None
+        )
+    except ValueError:
+        movie_rating = None
+
+    poster_url = data.get("Poster", "")
+    return movie_title, movie_year, movie_rating, poster_url
+
+
+def _format_rating(rating):
+    """Return the rating for table output, or 'N/A' if it is missing."""
+    return "N/A" if rating is None else rating
+
+
+def _write_lines(lines):
+    """Print all lines with a single write to stdout."""
+    sys.stdout.write("\n".join(lines) + "\n")
+
 
 # Option 1: List movies
 def list_movies(_=None):
@@ -45,69 +163,34 @@ def add_movie(_=None):
         title = input("Enter movie title: ").strip()
         if not title:
             print("⚠️ Movie title cannot be blank.")
-        elif not re.search(r"\w", title, re.UNICODE):
+        elif not _TITLE_RE.search(title):
             print("⚠️ Title must contain at least one letter or number.")
         else:
             break
 
-    # --- 2️⃣ API-Request with detailed errors ---
-    params = {"t": title, "apikey": API_KEY}
-    try:
-        response = requests.get(OMDB_URL, params=params, timeout=5)
-        response.raise_for_status()  # Check HTTP error codes
-    except requests.exceptions.ConnectionError:
-        print("⚠️ No internet connection. Please check your network.")
-        return
-    except requests.exceptions.Timeout:
-        print("⚠️ The request timed out. Try again later.")
-        return
-    except requests.exceptions.HTTPError as e:
-        print(f"⚠️ HTTP error: {e}")
-        return
-    except requests.exceptions.RequestException as e:
-        print(f"⚠️ Error connecting to OMDb API: {e}")
+    # --- 2️⃣ API-Request (or cache hit) with detailed errors ---
+    data, error = lookup_omdb(title)
+    if error is not None:
+        print(omdb_error_message(error))
         return
 
     # --- 3️⃣ Evaluate JSON ---
-    try:
-        data = response.json()
-    except ValueError:
-        print("⚠️ Invalid JSON response from OMDb.")
-        return
-
     if data.get("Response") == "False":
         print(f"⚠️ Movie '{title}' not found in OMDb.")
         return
 
     # --- 4️⃣ Extract movie data ---
-    movie_title = data.get("Title", title)
-
-    # Parse Year safely
-    year_raw = data.get("Year", "")
-    try:
-        movie_year = int(year_raw.split("–")[0])
-    except (ValueError, AttributeError):
-        movie_year = 0
-
-    # Parse IMDb ratings safely
-    try:
-        movie_rating = (
-            float(data.get("imdbRating"))
-            if data.get("imdbRating") not in (None, "N/A") else None
-        )
-    except ValueError:
-        movie_rating = None
-
-    poster_url = data.get("Poster", "")
+    movie_title, movie_year, movie_rating, poster_url = \
+        parse_omdb_movie(data, title)
 
     # --- 5️⃣ Check for duplicates ---
     try:
-        movies = storage.list_movies()
+        already_exists = storage.movie_exists(movie_title)
     except Exception as e:
         print(f"⚠️ Error accessing movie database: {e}")
         return
 
-    if movie_title.lower() in (m.lower() for m in movies):
+    if already_exists:
         print(f"⚠️ Movie '{movie_title}' already exists in the database.")
         return
 
@@ -140,27 +223,27 @@ def add_movie(_=None):
 def delete_movie(_=None):
     """Delete a movie by title."""
     title = input("Enter movie to delete: ").strip()
-    movies = storage.list_movies()
 
-    if title in movies:
-        storage.delete_movie(title)
-        print(f"🗑️ Movie '{title}' successfully deleted.")
-    else:
+    if storage.get_movie(title) is None:
         print(f"⚠️ Movie '{title}' doesn't exist.")
+        return
+
+    storage.delete_movie(title)
+    print(f"🗑️ Movie '{title}' successfully deleted.")
 
 
 # Option 4: Update movie rating
 def update_movie_rating(_=None):
     """Update the rating of an existing movie."""
     title = input("Enter movie name to update: ").strip()
-    movies = storage.list_movies()
+    movie = storage.get_movie(title)
 
-    if title not in movies:
+    if movie is None:
         print(f"⚠️ Movie '{title}' doesn't exist.")
         return
 
     try:
-        current_rating = movies[title]["rating"]
+        current_rating = movie["rating"]
         print(f"Current rating of '{title}': {current_rating}")
         new_rating = float(input("Enter new movie rating (0-10): "))
         if not (0 <= new_rating <= 10):
@@ -183,32 +266,21 @@ def update_movie_rating(_=None):
 # Option 5: Show statistics
 def show_movie_stats(_=None):
     """Show average, median, best, and worst movies."""
-    movies = storage.list_movies()
-    if not movies:
+    stats = storage.rating_stats()
+    if stats is None:  # error already reported by storage
+        return
+    if not stats["movie_count"]:
         print("❌ No movies in the database.")
         return
 
-    ratings = [
-        data["rating"] for data in movies.values()
-        if isinstance(data.get("rating"), (int, float))
-    ]
-    if not ratings:
+    if not stats["rating_count"]:
         print("⚠️ No valid ratings found.")
         return
 
-    average_rating = sum(ratings) / len(ratings)
-    median = statistics.median(ratings)
-
-    max_rating = max(ratings)
-    min_rating = min(ratings)
-    best_movies = [
-        title for title, data in movies.items()
-        if data["rating"] == max_rating
-    ]
-    worst_movies = [
-        title for title, data in movies.items()
-        if data["rating"] == min_rating
-    ]
+    average_rating = stats["average"]
+    median = stats["median"]
+    max_rating, best_movies = stats["max"], stats["best_movies"]
+    min_rating, worst_movies = stats["min"], stats["worst_movies"]
 
     print("\n📊 Movie Statistics")
     print("-" * 40)
@@ -221,12 +293,12 @@ def show_movie_stats(_=None):
 # Option 6: Random movie
 def recommend_random_movie(_=None):
     """Suggest a random movie."""
-    movies = storage.list_movies()
-    if not movies:
+    movie = storage.random_movie()
+    if movie is None:
         print("No movies in the database.")
         return
 
-    title, data = random.choice(list(movies.items()))
+    title, data = movie
     print("\n🎬 Movie Recommendation")
     print("-" * 40)
     print(f"🎞️ Title : {title}")
@@ -237,60 +309,47 @@ def recommend_random_movie(_=None):
 # Option 7: Search movies
 def search_movies(_=None):
     """Search movies by partial title (case-insensitive)."""
-    query = input("Enter part of movie name: ").strip().lower()
-    movies = storage.list_movies()
-    matches = {
-        title: data for title, data in movies.items()
-        if query in title.lower()
-    }
+    query = input("Enter part of movie name: ").strip()
+    matches = storage.search_movies(query)
 
     if matches:
-        print(f"Found movies ({len(matches)}):")
-        print("-" * 41)
+        lines = [f"Found movies ({len(matches)}):", SEARCH_SEP]
         for title, data in matches.items():
-            print(f"{title} ({data['year']}): Rating {data['rating']}")
-            print("-" * 41)
+            lines.append(f"{title} ({data['year']}): Rating {data['rating']}")
+            lines.append(SEARCH_SEP)
+        _write_lines(lines)
     else:
         print("No movies found.")
 
 
+def _show_sorted(key):
+    """Display all movies sorted by the given column (descending)."""
+    rows = [TABLE_HEADER, TABLE_SEP]
+    for title, data in storage.sorted_by(key).items():
+        display_title = title if len(title) <= MAX_TITLE_LENGTH \
+            else title[:MAX_TITLE_LENGTH - 3] + "..."
+        rows.append(
+            f"{display_title:<40} {data['year']:<8} "
+            f"{_format_rating(data['rating']):<6}"
+        )
+    _write_lines(rows)
+
+
 # Option 8: Sort movies by rating
 def sort_movies_by_rating(_=None):
     """Display movies sorted by rating (high to low)."""
-    movies = storage.list_movies()
-    sorted_movies = sorted(movies.items(),
-                           key=lambda x: x[1]["rating"],
-                           reverse=True)
-
-    print(f"{'Title':<40} {'Year':<8} {'Rating':<6}")
-    print("-" * 56)
-    for title, data in sorted_movies:
-        display_title = (            title) if len(title) <= MAX_TITLE_LENGTH \
-            else title[:MAX_TITLE_LENGTH - 3] + "..."
-        print(f"{display_title:<40} {data['year']:<8} {data['rating']:<6}")
+    _show_sorted("rating")
 
 
 # Option 9: Sort movies by year
 def sort_movies_by_year(_=None):
     """Display movies sorted by year (newest first)."""
-    movies = storage.list_movies()
-    sorted_movies = sorted(movies.items(),
-                           key=lambda x: x[1]["year"],
-                           reverse=True)
-
-    print(f"{'Title':<40} {'Year':<8} {'Rating':<6}")
-    print("-" * 56)
-    for title, data in sorted_movies:
-        display_title = (title) if len(title) <= MAX_TITLE_LENGTH \
-            else title[:MAX_TITLE_LENGTH - 3] + "..."
-        print(f"{display_title:<40} {data['year']:<8} {data['rating']:<6}")
+    _show_sorted("year")
 
 
 # Option 10: Filter movies
 def filter_movies_by_criteria(_=None):
     """Filter movies by minimum rating and year range."""
-    movies = storage.list_movies()
-
     min_rating_input = input(
         "Enter minimum rating (leave blank for no minimum): "
     ).strip()
@@ -319,19 +378,20 @@ def filter_movies_by_criteria(_=None):
         print("⚠️ Invalid input for end year, default 9999 used.")
         year_to = 9999
 
-    filtered_movies = {
-        title: data
-        for title, data in movies.items()
-        if min_rating <= data["rating"] <= 10
-           and year_from <= data["year"] <= year_to
-    }
+    filtered_movies = storage.filter_movies(min_rating, year_from, year_to)
 
     if filtered_movies:
-        print(f"\nFound films ({len(filtered_movies)}):")
-        print(f"{'Title':<40} {'Year':<8} {'Rating':<6}")
-        print("-" * 56)
+        rows = [
+            f"\nFound films ({len(filtered_movies)}):",
+            TABLE_HEADER,
+            TABLE_SEP
+        ]
         for title, data in filtered_movies.items():
-            print(f"{title:<40} {data['year']:<8} {data['rating']:<6}")
+            rows.append(
+                f"{title:<40} {data['year']:<8} "
+                f"{_format_rating(data['rating']):<6}"
+            )
+        _write_lines(rows)
     else:
         print("\nNo film meets the filter criteria.")
 
@@ -361,30 +421,99 @@ def generate_website(_=None):
     </html>
     """
 
-    movies = storage.list_movies()
-    if not movies:
-        movie_grid = "<p>No movies in the database.</p>"
-    else:
-        movie_grid = ""
-        for title, data in movies.items():
-            poster = data.get("poster_url") or PLACEHOLDER_POSTER
-            year = data.get("year", "N/A")
-            movie_grid += f"""
-            <li>
-                <div class="movie">
-                    <img class="movie-poster" src="{poster}" alt="Poster of {title}"/>
-                    <div class="movie-title">{title}</div>
-                    <div class="movie-year">{year}</div>
-                </div>
-            </li>
-            """
+    global _last_html_sig
+    html_header, html_footer = HTML_TEMPLATE.split("__TEMPLATE_MOVIE_GRID__")
 
-    html_content = HTML_TEMPLATE.replace("__TEMPLATE_MOVIE_GRID__", movie_grid)
+    # Stream each movie into a temp file while fingerprinting the rows
+    tmp_html = OUTPUT_HTML + ".tmp"
+    hasher = hashlib.blake2b()
+    movie_count = 0
+    try:
+        with open(tmp_html, "w", encoding="utf-8") as f:
+            f.write(html_header)
+            for title, data in storage.iter_movies():
+                hasher.update(json.dumps([title, data]).encode())
+                movie_count += 1
+                f.write(MOVIE_ITEM_TEMPLATE.format(
+                    poster=html.escape(
+                        data.get("poster_url") or PLACEHOLDER_POSTER,
+                        quote=True
+                    ),
+                    title=html.escape(title, quote=True),
+                    year=html.escape(str(data.get("year", "N/A")), quote=True)
+                ))
+            if not movie_count:
+                f.write("<p>No movies in the database.</p>")
+            f.write(html_footer)
+
+        sig = hasher.digest()
+        if sig == _last_html_sig and os.path.exists(OUTPUT_HTML):
+            os.remove(tmp_html)
+            print(f"✅ Website '{OUTPUT_HTML}' is already up to date.")
+            return
+        os.replace(tmp_html, OUTPUT_HTML)
+    except Exception as e:
+        if os.path.exists(tmp_html):
+            os.remove(tmp_html)
+        print(f"⚠️ Error generating website, '{OUTPUT_HTML}' not updated: {e}")
+        return
+    _last_html_sig = sig
 
-    with open(OUTPUT_HTML, "w", encoding="utf-8") as f:
-        f.write(html_content)
+    print(f"✅ Website generated successfully at '{OUTPUT_HTML}' with {movie_count} movies.")
 
-    print(f"✅ Website generated successfully at '{OUTPUT_HTML}' with {len(movies)} movies.")
+
+# Option 12: Import movies from a list of titles
+def import_movies_from_omdb(_=None):
+    """Look up several titles on OMDb at once and add them in one batch."""
+    titles_input = input("Enter movie titles (comma-separated): ")
+    titles = [t.strip() for t in titles_input.split(",") if t.strip()]
+    if not titles:
+        print("⚠️ No titles entered.")
+        return
+
+    rows = []
+    seen = set()
+    for title, (data, error) in fetch_omdb_movies(titles).items():
+        if error is not None:
+            print(f"⚠️ Lookup of '{title}' failed:")
+            print(omdb_error_message(error))
+            continue
+        if data.get("Response") == "False":
+            print(f"⚠️ Movie '{title}' not found in OMDb.")
+            continue
+        movie_title, movie_year, movie_rating, poster_url = \
+            parse_omdb_movie(data, title)
+        if movie_rating is None or movie_rating == 0:
+            print(
+                f"⚠️ Movie '{movie_title}' has no IMDb rating, skipped. "
+                f"Add it with option 2 to rate it yourself."
+            )
+            continue
+        title_cf = movie_title.casefold()
+        if title_cf in seen:
+            print(f"⚠️ Movie '{movie_title}' is listed more than once.")
+            continue
+        try:
+            already_exists = storage.movie_exists(movie_title)
+        except Exception as e:
+            print(f"⚠️ Error accessing movie database: {e}")
+            print("Import cancelled, no movies were added.")
+            return
+        if already_exists:
+            print(f"⚠️ Movie '{movie_title}' already exists in the database.")
+            continue
+        seen.add(title_cf)
+        rows.append({
+            "title": movie_title,
+            "year": movie_year,
+            "rating": movie_rating,
+            "poster_url": poster_url
+        })
+
+    if rows:
+        storage.add_movies_bulk(rows)
+    else:
+        print("No new movies to import.")
 
 
 # Option 0: Exit
@@ -407,7 +536,8 @@ menu_actions = {
     "8": sort_movies_by_rating,
     "9": sort_movies_by_year,
     "10": filter_movies_by_criteria,
-    "11": generate_website
+    "11": generate_website,
+    "12": import_movies_from_omdb
 }
 
 
@@ -427,9 +557,10 @@ def main():
         print("9.  Movies sorted by year")
         print("10. Filter movies")
         print("11. Generate website")
+        print("12. Import from OMDb list")
         print()
 
-        your_choice = input("Enter choice (0-10): ").strip()
+        your_choice = input("Enter choice (0-12): ").strip()
         print()
 
         action = menu_actions.get(your_choice)
@@ -437,7 +568,7 @@ def main():
         if action:
             action()
         else:
-            print("❌ Invalid choice, please select a number from 0 to 10.")
+            print("❌ Invalid choice, please select a number from 0 to 12.")
 
         print()
         input("Press enter to continue...")
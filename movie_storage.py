@@ -3,27 +3,41 @@ import os
 
 FILENAME = "movies.json"
 
+# Movies loaded from FILENAME, kept in sync by save_movies()
+_movies_cache = None
+
 def get_movies():
     """
     Loads movies from the JSON file and returns them as
     a list of dictionaries.
     Returns an empty list if the file does not exist
     or is invalid.
+    The file is only parsed once; later calls return a copy
+    of the cached list, so callers may modify the result.
     """
-    if not os.path.exists(FILENAME):
-        return []
-    try:
-        with open(FILENAME, "r") as file:
-            return json.load(file)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return []
+    global _movies_cache
+    if _movies_cache is None:
+        if not os.path.exists(FILENAME):
+            return []
+        try:
+            with open(FILENAME, "r") as file:
+                _movies_cache = json.load(file)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return []
+    return [dict(movie) for movie in _movies_cache]
 
 def save_movies(movies):
     """
     Saves the list of movie dictionaries to the JSON file.
+    The file and the cached list are only replaced
+    once the write succeeded.
     """
-    with open(FILENAME, "w") as file:
-        json.dump(movies, file, indent = 2)
+    global _movies_cache
+    tmp_filename = FILENAME + ".tmp"
+    with open(tmp_filename, "w") as file:
+        json.dump(movies, file)
+    os.replace(tmp_filename, FILENAME)
+    _movies_cache = [dict(movie) for movie in movies]
 
 def add_movie(title, rating, year):
     """
@@ -31,9 +45,10 @@ def add_movie(title, rating, year):
     Overwrites if title already exists (case-insensitive).
     """
     movies = get_movies()
+    title_cf = title.casefold()
 
     for movie in movies:
-        if movie.get("Title", "").lower() == title.lower():
+        if movie.get("Title", "").casefold() == title_cf:
             movie["Year"] = year
             movie["Rating"] = rating
             save_movies(movies)
@@ -49,8 +64,9 @@ def delete_movie(delete_movie):
     based on its titel (case-insensitive).
     """
     movies = get_movies()
+    delete_cf = delete_movie.casefold()
     updated = [movie for movie in movies
-               if movie.get("Title", "").lower() != delete_movie.lower()
+               if movie.get("Title", "").casefold() != delete_cf
                ]
     save_movies(updated)
 
@@ -60,8 +76,9 @@ def update_movie(check_movie, new_rating):
     (case-insensitive).
     """
     movies = get_movies()
+    check_cf = check_movie.casefold()
     for movie in movies:
-        if movie.get("Title", "").lower() == check_movie.lower():
+        if movie.get("Title", "").casefold() == check_cf:
             movie["Rating"] = new_rating
             save_movies(movies)
             return
@@ -1,43 +1,332 @@
-from sqlalchemy import create_engine, text
+import json
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import QueuePool
 
 # ---------------------------
 # Database setup
 # ---------------------------
 DB_URL = "sqlite:///movies.db"
-engine = create_engine(DB_URL, echo=True)
+SCHEMA_VERSION = 3  # bump when the DDL below changes
+OMDB_CACHE_TTL = 30 * 24 * 60 * 60  # 30 days in seconds
+engine = create_engine(
+    DB_URL,
+    echo=False,
+    future=True,
+    poolclass=QueuePool,  # keep connections open between CRUD calls
+    pool_size=4,
+    max_overflow=0,
+    pool_pre_ping=False,
+    connect_args={"check_same_thread": False},
+)
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, _connection_record):
+    """Tune every new SQLite connection (WAL, busy timeout, cache)."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-20000")
+    cursor.close()
 
-# Create the movies table if it does not exist
+
+# Create the schema only if this database has not been set up yet
 with engine.begin() as connection:  # auto commit
-    connection.execute(text("""
-        CREATE TABLE IF NOT EXISTS movies (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT UNIQUE NOT NULL,
-            year INTEGER NOT NULL,
-            rating REAL,
-            poster_url TEXT
-        )
-    """))
+    version = connection.execute(text("PRAGMA user_version")).scalar()
+    if version < 1:
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS movies (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT UNIQUE NOT NULL,
+                year INTEGER NOT NULL,
+                rating REAL,
+                poster_url TEXT
+            )
+        """))
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS omdb_cache (
+                title_lower TEXT PRIMARY KEY,
+                json TEXT NOT NULL,
+                fetched_at INTEGER NOT NULL
+            )
+        """))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_movies_rating ON movies(rating)"
+        ))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_movies_year ON movies(year)"
+        ))
+    if version < 2:
+        # Casefolded title for duplicate checks (SQLite's lower() is ASCII only)
+        connection.execute(text(
+            "ALTER TABLE movies ADD COLUMN title_key TEXT"
+        ))
+        rows = connection.execute(text("SELECT id, title FROM movies")).all()
+        if rows:
+            connection.execute(
+                text("UPDATE movies SET title_key = :title_key WHERE id = :id"),
+                [{"id": row[0], "title_key": row[1].casefold()} for row in rows]
+            )
+        connection.execute(text("DROP INDEX IF EXISTS idx_movies_title_lower"))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_movies_title_key "
+            "ON movies(title_key)"
+        ))
+    if version < 3:
+        # Substring search ('%...%') cannot use this index
+        connection.execute(text("DROP INDEX IF EXISTS idx_movies_title_nocase"))
+    if version < SCHEMA_VERSION:
+        connection.execute(text(f"PRAGMA user_version={SCHEMA_VERSION}"))
+
+# ---------------------------
+# Prepared statements
+# ---------------------------
+_SELECT_ALL = text("SELECT title, year, rating, poster_url FROM movies")
+
+_INSERT = text("""
+    INSERT INTO movies (title, title_key, year, rating, poster_url)
+    VALUES (:title, :title_key, :year, :rating, :poster_url)
+""")
+
+_SORTED_BY_RATING = text(
+    "SELECT title, year, rating, poster_url FROM movies ORDER BY rating DESC"
+)
+
+_SORTED_BY_YEAR = text(
+    "SELECT title, year, rating, poster_url FROM movies ORDER BY year DESC"
+)
+
+_SORTED_BY = {"rating": _SORTED_BY_RATING, "year": _SORTED_BY_YEAR}
+
+_FILTER = text("""
+    SELECT title, year, rating, poster_url FROM movies
+    WHERE rating >= :min_rating AND rating <= 10
+      AND year BETWEEN :year_from AND :year_to
+    ORDER BY rating DESC
+""")
+
+_SEARCH = text("""
+    SELECT title, year, rating, poster_url FROM movies
+    WHERE title_key LIKE :pattern ESCAPE '\\'
+""")
+
+_SELECT_ONE = text(
+    "SELECT year, rating, poster_url FROM movies WHERE title = :title LIMIT 1"
+)
+
+_RANDOM_ONE = text(
+    "SELECT title, year, rating, poster_url FROM movies "
+    "ORDER BY RANDOM() LIMIT 1"
+)
+
+_RATING_STATS = text("""
+    SELECT COUNT(*), COUNT(rating), AVG(rating), MIN(rating), MAX(rating)
+    FROM movies
+""")
+
+# Middle one (odd count) or two (even count) ratings for the median
+_RATING_MEDIAN = text("""
+    SELECT rating FROM movies
+    WHERE rating IS NOT NULL
+    ORDER BY rating
+    LIMIT :limit OFFSET :offset
+""")
+
+_TITLES_WITH_RATING = text("SELECT title FROM movies WHERE rating = :rating")
+
+_EXISTS = text(
+    "SELECT 1 FROM movies WHERE title_key = :title_key LIMIT 1"
+)
+
+_DELETE = text("DELETE FROM movies WHERE title = :title")
+
+_UPDATE_RATING = text(
+    "UPDATE movies SET rating = :rating WHERE title = :title"
+)
+
+_UPDATE_POSTER = text(
+    "UPDATE movies SET poster_url = :poster_url WHERE title = :title"
+)
+
+_UPDATE_BOTH = text("""
+    UPDATE movies
+    SET rating = :rating, poster_url = :poster_url
+    WHERE title = :title
+""")
+
+_SELECT_OMDB_CACHE = text(
+    "SELECT json FROM omdb_cache "
+    "WHERE title_lower = :title_lower AND fetched_at >= :min_fetched_at"
+)
+
+_UPSERT_OMDB_CACHE = text("""
+    INSERT OR REPLACE INTO omdb_cache (title_lower, json, fetched_at)
+    VALUES (:title_lower, :json, :fetched_at)
+""")
+
+# In-memory copy of the movies table, kept in sync by the write functions
+_cache = None
 
 # ---------------------------
 # CRUD functions
 # ---------------------------
 def list_movies():
-    """Retrieve all movies from the database."""
+    """
+    Retrieve all movies from the database.
+    The result is cached until the next add, delete or update,
+    so callers must not modify the returned dictionary.
+    """
+    global _cache
+    if _cache is not None:
+        return _cache
     try:
-        with engine.begin() as connection:
-            result = connection.execute(text(
-                "SELECT title, year, rating, poster_url FROM movies"
-            ))
+        with engine.connect() as connection:  # read only, no BEGIN needed
+            result = connection.execute(_SELECT_ALL)
             movies = result.fetchall()
-        return {
+        _cache = {
             row[0]: {"year": row[1], "rating": row[2], "poster_url": row[3]}
             for row in movies
         }
+        return _cache
     except Exception as e:
         print(f"⚠️ Error fetching movies: {e}")
         return {}
 
 
+def _query_movies(query, params=None):
+    """Run a SELECT on the movies table and return rows as a title dict."""
+    try:
+        with engine.connect() as connection:
+            rows = connection.execute(query, params or {}).fetchall()
+        return {
+            row[0]: {"year": row[1], "rating": row[2], "poster_url": row[3]}
+            for row in rows
+        }
+    except Exception as e:
+        print(f"⚠️ Error fetching movies: {e}")
+        return {}
+
+
+def iter_movies():
+    """
+    Yield (title, data) pairs for all movies one at a time,
+    without building the full dictionary.
+    Unlike list_movies, database errors are raised to the caller,
+    so a partial result is never mistaken for the full table.
+    """
+    if _cache is not None:
+        yield from _cache.items()
+        return
+    with engine.connect() as connection:
+        for row in connection.execute(_SELECT_ALL):
+            yield row[0], {
+                "year": row[1], "rating": row[2], "poster_url": row[3]
+            }
+
+
+def sorted_by(key):
+    """Return all movies ordered by 'rating' or 'year' (descending)."""
+    return _query_movies(_SORTED_BY[key])
+
+
+def filter_movies(min_rating=0, year_from=0, year_to=9999):
+    """Return movies with at least min_rating released in the year range."""
+    return _query_movies(_FILTER, {
+        "min_rating": min_rating, "year_from": year_from, "year_to": year_to
+    })
+
+
+def search_movies(query):
+    """Return movies whose title contains query (case-insensitive)."""
+    escaped = (
+        query.casefold()
+        .replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    )
+    return _query_movies(_SEARCH, {"pattern": f"%{escaped}%"})
+
+
+def get_movie(title):
+    """Return a single movie's data by exact title, or None if missing."""
+    if _cache is not None:
+        return _cache.get(title)
+    try:
+        with engine.connect() as connection:
+            row = connection.execute(_SELECT_ONE, {"title": title}).first()
+    except Exception as e:
+        print(f"⚠️ Error fetching movie '{title}': {e}")
+        return None
+    if row is None:
+        return None
+    return {"year": row[0], "rating": row[1], "poster_url": row[2]}
+
+
+def random_movie():
+    """Return a random (title, data) pair, or None if there are no movies."""
+    try:
+        with engine.connect() as connection:
+            row = connection.execute(_RANDOM_ONE).first()
+    except Exception as e:
+        print(f"⚠️ Error fetching random movie: {e}")
+        return None
+    if row is None:
+        return None
+    return row[0], {"year": row[1], "rating": row[2], "poster_url": row[3]}
+
+
+def rating_stats():
+    """
+    Compute rating statistics in SQL.
+    Returns a dict with movie_count, rating_count, average, median,
+    min, max, best_movies and worst_movies (titles with min/max rating),
+    or None if the database could not be read.
+    """
+    try:
+        with engine.connect() as connection:
+            movie_count, rating_count, average, min_rating, max_rating = \
+                connection.execute(_RATING_STATS).one()
+            stats = {
+                "movie_count": movie_count,
+                "rating_count": rating_count,
+                "average": average,
+                "median": None,
+                "min": min_rating,
+                "max": max_rating,
+                "best_movies": [],
+                "worst_movies": []
+            }
+            if not rating_count:
+                return stats
+
+            middle = connection.execute(_RATING_MEDIAN, {
+                "limit": 2 - rating_count % 2,
+                "offset": (rating_count - 1) // 2
+            }).scalars().all()
+            stats["median"] = sum(middle) / len(middle)
+            stats["best_movies"] = connection.execute(
+                _TITLES_WITH_RATING, {"rating": max_rating}
+            ).scalars().all()
+            stats["worst_movies"] = connection.execute(
+                _TITLES_WITH_RATING, {"rating": min_rating}
+            ).scalars().all()
+    except Exception as e:
+        print(f"⚠️ Error computing rating statistics: {e}")
+        return None
+    return stats
+
+
+def movie_exists(title):
+    """Check case-insensitively whether a movie title is already stored."""
+    with engine.connect() as connection:
+        result = connection.execute(
+            _EXISTS, {"title_key": title.casefold()}
+        )
+        return result.first() is not None
+
+
 def add_movie(title, year, rating=None, poster_url=None):
     """Add a new movie to the database."""
     if not title.strip():
@@ -46,31 +335,59 @@ def add_movie(title, year, rating=None, poster_url=None):
     try:
         with engine.begin() as connection:
             connection.execute(
-                text("""
-                    INSERT INTO movies (title, year, rating, poster_url)
-                    VALUES (:title, :year, :rating, :poster_url)
-                """),
+                _INSERT,
                 {
                     "title": title,
+                    "title_key": title.casefold(),
                     "year": year,
                     "rating": rating,
                     "poster_url": poster_url
                 }
             )
+        if _cache is not None:
+            _cache[title] = {
+                "year": year, "rating": rating, "poster_url": poster_url
+            }
         print(f"✅ Movie '{title}' added successfully.")
     except Exception as e:
         print(f"⚠️ Error adding movie '{title}': {e}")
 
 
+def add_movies_bulk(rows):
+    """
+    Add several movies in a single transaction.
+    Each row is a dict with title, year, rating and poster_url.
+    """
+    if not rows:
+        return
+    try:
+        with engine.begin() as connection:
+            connection.execute(_INSERT, [  # executemany
+                {**row, "title_key": row["title"].casefold()} for row in rows
+            ])
+        if _cache is not None:
+            for row in rows:
+                _cache[row["title"]] = {
+                    "year": row["year"],
+                    "rating": row["rating"],
+                    "poster_url": row["poster_url"]
+                }
+        print(f"✅ {len(rows)} movies added successfully.")
+    except Exception as e:
+        print(f"⚠️ Error adding movies: {e}")
+
+
 def delete_movie(title):
     """Delete a movie from the database."""
     try:
         with engine.begin() as connection:
             result = connection.execute(
-                text("DELETE FROM movies WHERE title = :title"),
+                _DELETE,
                 {"title": title}
             )
         if result.rowcount > 0:
+            if _cache is not None:
+                _cache.pop(title, None)
             print(f"✅ Movie '{title}' deleted successfully.")
         else:
             print(f"⚠️ Movie '{title}' not found.")
@@ -87,32 +404,56 @@ def update_movie(title, rating=None, poster_url=None):
     try:
         with engine.begin() as connection:
             if rating is not None and poster_url is not None:
-                query = text("""
-                    UPDATE movies 
-                    SET rating = :rating, poster_url = :poster_url 
-                    WHERE title = :title
-                """)
+                query = _UPDATE_BOTH
                 params = {
                     "title": title, "rating": rating, "poster_url": poster_url
                 }
             elif rating is not None:
-                query = text(
-                    "UPDATE movies SET rating = :rating WHERE title = :title"
-                )
+                query = _UPDATE_RATING
                 params = {"title": title, "rating": rating}
             else:  # only poster_url
-                query = text(
-                    "UPDATE movies "
-                    "SET poster_url = :poster_url "
-                    "WHERE title = :title"
-                )
+                query = _UPDATE_POSTER
                 params = {"title": title, "poster_url": poster_url}
 
             result = connection.execute(query, params)
 
         if result.rowcount > 0:
+            if _cache is not None and title in _cache:
+                _cache[title].update(
+                    {k: v for k, v in params.items() if k != "title"}
+                )
             print(f"✅ Movie '{title}' updated successfully.")
         else:
             print(f"⚠️ Movie '{title}' not found.")
     except Exception as e:
-        print(f"⚠️ Error updating movie '{title}': {e}")
\ No newline at end of file
+        print(f"⚠️ Error updating movie '{title}': {e}")
+
+
+# ---------------------------
+# OMDb response cache
+# ---------------------------
+def get_cached_omdb(title, max_age=OMDB_CACHE_TTL):
+    """Return the cached OMDb data for a title, or None if missing/expired."""
+    try:
+        with engine.connect() as connection:
+            row = connection.execute(_SELECT_OMDB_CACHE, {
+                "title_lower": title.casefold(),
+                "min_fetched_at": int(time.time()) - max_age
+            }).first()
+        return json.loads(row[0]) if row else None
+    except Exception as e:
+        print(f"⚠️ Error reading OMDb cache for '{title}': {e}")
+        return None
+
+
+def cache_omdb(title, data):
+    """Store an OMDb response for a title in the cache."""
+    try:
+        with engine.begin() as connection:
+            connection.execute(_UPSERT_OMDB_CACHE, {
+                "title_lower": title.casefold(),
+                "json": json.dumps(data),
+                "fetched_at": int(time.time())
+            })
+    except Exception as e:
+        print(f"⚠️ Error writing OMDb cache for '{title}': {e}")